@@ -2,13 +2,17 @@
 
 import streamlit as st
 import os
+import shutil
 import tempfile
 from vectors import EmbeddingsManager
 import base64
 from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+# Load environment variables and the embedding model once per process, reused across reruns
+@st.cache_resource
+def get_embeddings_manager():
+    load_dotenv()
+    return EmbeddingsManager()
 
 # Initialize session state
 if 'processed_files' not in st.session_state:
@@ -55,41 +59,47 @@ Upload your files and click process to begin.
 """)
 
 # Initialize EmbeddingsManager
-embeddings_manager = EmbeddingsManager()
+embeddings_manager = get_embeddings_manager()
 
 # Create columns for layout
 col1, col2 = st.columns([2, 1])
 
 with col1:
     # File uploader
-    uploaded_file = st.file_uploader("Upload a document")
+    uploaded_files = st.file_uploader("Upload documents", accept_multiple_files=True)
 
-    if uploaded_file is not None:
-        st.success("📄 File Uploaded Successfully!")
-        st.markdown(f"**Filename:** {uploaded_file.name}")
-        st.markdown(f"**File Size:** {uploaded_file.size} bytes")
-
-        # Create a temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1]) as tmp_file:
-            tmp_file.write(uploaded_file.getvalue())
-            tmp_file_path = tmp_file.name
+    if uploaded_files:
+        st.success(f"📄 {len(uploaded_files)} File(s) Uploaded Successfully!")
+        for uploaded_file in uploaded_files:
+            st.markdown(f"**Filename:** {uploaded_file.name}")
+            st.markdown(f"**File Size:** {uploaded_file.size} bytes")
 
         # Process button
-        if st.button("Process Document"):
-            with st.spinner("Processing document..."):
+        if st.button("Process Documents"):
+            # Create temporary files, streaming each upload in 1 MiB chunks
+            tmp_file_paths = []
+            for uploaded_file in uploaded_files:
+                with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1]) as tmp_file:
+                    uploaded_file.seek(0)
+                    shutil.copyfileobj(uploaded_file, tmp_file, length=1024 * 1024)
+                    tmp_file_paths.append(tmp_file.name)
+
+            with st.spinner("Processing documents..."):
                 try:
-                    result = embeddings_manager.create_embeddings(tmp_file_path)
+                    result = embeddings_manager.create_embeddings(tmp_file_paths)
                     st.success(result)
                     
                     # Add to processed files list
-                    if uploaded_file.name not in st.session_state.processed_files:
-                        st.session_state.processed_files.append(uploaded_file.name)
+                    for uploaded_file in uploaded_files:
+                        if uploaded_file.name not in st.session_state.processed_files:
+                            st.session_state.processed_files.append(uploaded_file.name)
                         
                 except Exception as e:
-                    st.error(f"Error processing document: {str(e)}")
+                    st.error(f"Error processing documents: {str(e)}")
             
-            # Clean up temporary file
-            os.unlink(tmp_file_path)
+            # Clean up temporary files
+            for tmp_file_path in tmp_file_paths:
+                os.unlink(tmp_file_path)
 
 with col2:
     # Display processed files
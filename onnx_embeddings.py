@@ -0,0 +1,178 @@
+# onnx_embeddings.py
+
+import os
+from typing import List, Optional
+import numpy as np
+from langchain_community.embeddings.huggingface import DEFAULT_QUERY_BGE_INSTRUCTION_EN
+from langchain_core.embeddings import Embeddings
+from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+from optimum.onnxruntime.configuration import AutoQuantizationConfig
+from transformers import AutoTokenizer
+
+def default_onnx_dir(model_name: str) -> str:
+    """
+    Returns the export directory for a model, one per model name.
+
+    Args:
+        model_name (str): The HuggingFace model name.
+
+    Returns:
+        str: Directory holding the exported ONNX model and tokenizer.
+    """
+    return os.path.join("bge-onnx", model_name.replace("/", "--"))
+
+
+class OnnxBgeEmbeddings(Embeddings):
+    def __init__(
+        self,
+        model_name: str = "BAAI/bge-small-en",
+        onnx_dir: Optional[str] = None,
+        quantize: bool = False,
+        normalize_embeddings: bool = True,
+        query_instruction: str = DEFAULT_QUERY_BGE_INSTRUCTION_EN,
+        batch_size: int = 32,
+    ):
+        """
+        Initializes a BGE embedding model served through ONNX Runtime on CPU.
+
+        The model is exported to ONNX on first use and loaded from `onnx_dir`
+        afterwards, so the export only happens once per machine.
+
+        Args:
+            model_name (str): The HuggingFace model name to export.
+            onnx_dir (Optional[str]): Directory holding the exported ONNX model and tokenizer.
+                Defaults to a per-model directory under bge-onnx/.
+            quantize (bool): Use an INT8 dynamically quantized copy of the model.
+            normalize_embeddings (bool): L2-normalize the output vectors.
+            query_instruction (str): Instruction prepended to search queries.
+            batch_size (int): Number of texts per ONNX Runtime forward pass.
+        """
+        self.model_name = model_name
+        self.onnx_dir = onnx_dir or default_onnx_dir(model_name)
+        self.quantize = quantize
+        self.normalize_embeddings = normalize_embeddings
+        self.query_instruction = query_instruction
+        self.batch_size = batch_size
+
+        if not os.path.exists(os.path.join(self.onnx_dir, "model.onnx")):
+            self._export()
+
+        file_name = "model.onnx"
+        if self.quantize:
+            file_name = self._quantize()
+
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            self.onnx_dir,
+            file_name=file_name,
+            provider="CPUExecutionProvider",
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(self.onnx_dir)
+
+    def _export(self):
+        """
+        Exports the HuggingFace model and its tokenizer to `onnx_dir`.
+        """
+        model = ORTModelForFeatureExtraction.from_pretrained(self.model_name, export=True)
+        model.save_pretrained(self.onnx_dir)
+        AutoTokenizer.from_pretrained(self.model_name).save_pretrained(self.onnx_dir)
+
+    def _quantize(self) -> str:
+        """
+        Creates an INT8 dynamically quantized copy of the exported model.
+
+        Returns:
+            str: File name of the quantized model inside `onnx_dir`.
+        """
+        file_name = "model_quantized.onnx"
+        if not os.path.exists(os.path.join(self.onnx_dir, file_name)):
+            quantizer = ORTQuantizer.from_pretrained(self.onnx_dir, file_name="model.onnx")
+            quantizer.quantize(
+                save_dir=self.onnx_dir,
+                quantization_config=AutoQuantizationConfig.avx2(is_static=False, per_channel=False),
+            )
+        return file_name
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Runs the ONNX model on a list of texts.
+
+        All texts are tokenized in a single call, then sorted by token length
+        and each batch is padded only to its own longest sequence, so little
+        compute is spent on padding tokens.
+
+        Args:
+            texts (List[str]): The texts to embed.
+
+        Returns:
+            List[List[float]]: One embedding per text, in input order.
+        """
+        if not texts:
+            return []
+
+        encodings = self.tokenizer(texts, padding=False, truncation=True)
+        order = np.argsort([len(input_ids) for input_ids in encodings["input_ids"]])[::-1]
+
+        sorted_vectors = []
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            inputs = self.tokenizer.pad(
+                {key: [values[i] for i in batch] for key, values in encodings.items()},
+                padding="longest",
+                return_tensors="np",
+            )
+            outputs = self.model(**inputs)
+            # BGE is trained with CLS pooling
+            sorted_vectors.append(np.asarray(outputs.last_hidden_state[:, 0], dtype=np.float32))
+
+        # Restore the original order
+        sorted_vectors = np.concatenate(sorted_vectors)
+        vectors = np.empty_like(sorted_vectors)
+        vectors[order] = sorted_vectors
+        if self.normalize_embeddings:
+            vectors = self._normalize(vectors)
+        return vectors.tolist()
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """
+        L2-normalizes each row in place with a single einsum reduction.
+
+        Half-precision inputs are promoted to fp32 first so the reduction
+        does not lose precision.
+
+        Args:
+            vectors (np.ndarray): Matrix of shape (n_texts, dim).
+
+        Returns:
+            np.ndarray: The normalized fp32 matrix.
+        """
+        if vectors.dtype != np.float32:
+            vectors = vectors.astype(np.float32)
+        norms = np.einsum("ij,ij->i", vectors, vectors, optimize=True)
+        np.sqrt(norms, out=norms)
+        vectors /= norms[:, None]
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Computes document embeddings.
+
+        Args:
+            texts (List[str]): The documents to embed.
+
+        Returns:
+            List[List[float]]: One embedding per document.
+        """
+        return self._embed([text.replace("\n", " ") for text in texts])
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Computes a query embedding, prefixed with the BGE search instruction.
+
+        Args:
+            text (str): The query to embed.
+
+        Returns:
+            List[float]: The query embedding.
+        """
+        return self._embed([self.query_instruction + text.replace("\n", " ")])[0]
@@ -1,10 +1,233 @@
+import hashlib
+import json
 import os
-from typing import List, Dict
+import sqlite3
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple, Union
+import numpy as np
+import torch
 from langchain_community.document_loaders import UnstructuredFileLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import HuggingFaceBgeEmbeddings
-from langchain_community.vectorstores import Qdrant
 from langchain.docstore.document import Document
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import (
+    Distance,
+    OptimizersConfigDiff,
+    PointStruct,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    VectorParams,
+)
+from onnx_embeddings import OnnxBgeEmbeddings, default_onnx_dir
+
+
+def _bf16_supported(device: str) -> bool:
+    """
+    Checks whether the device can run bfloat16 matmuls natively.
+
+    Args:
+        device (str): The device the model runs on ('cpu' or 'cuda').
+
+    Returns:
+        bool: True if bf16 is supported in hardware, False otherwise.
+    """
+    if device.startswith("cuda"):
+        return torch.cuda.is_available() and torch.cuda.is_bf16_supported()
+    try:
+        with open("/proc/cpuinfo") as f:
+            cpu_flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in cpu_flags or "amx_bf16" in cpu_flags
+
+
+def _content_hash(text: str) -> str:
+    """
+    Returns a short content hash used to key cached embeddings.
+
+    Args:
+        text (str): The chunk text.
+
+    Returns:
+        str: Hex digest of the text.
+    """
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+# Chunk size and overlap per file extension
+_CHUNK_SETTINGS = {
+    # Text files and documentation
+    '.txt': {'chunk_size': 1000, 'chunk_overlap': 200},
+    '.md': {'chunk_size': 1000, 'chunk_overlap': 200},
+    '.pdf': {'chunk_size': 1000, 'chunk_overlap': 200},
+    '.doc': {'chunk_size': 1000, 'chunk_overlap': 200},
+    '.docx': {'chunk_size': 1000, 'chunk_overlap': 200},
+
+    # Code files
+    '.py': {'chunk_size': 800, 'chunk_overlap': 150},
+    '.js': {'chunk_size': 800, 'chunk_overlap': 150},
+    '.jsx': {'chunk_size': 800, 'chunk_overlap': 150},
+    '.ts': {'chunk_size': 800, 'chunk_overlap': 150},
+    '.tsx': {'chunk_size': 800, 'chunk_overlap': 150},
+    '.css': {'chunk_size': 600, 'chunk_overlap': 100},
+    '.scss': {'chunk_size': 600, 'chunk_overlap': 100},
+    '.html': {'chunk_size': 800, 'chunk_overlap': 150},
+
+    # Data files
+    '.json': {'chunk_size': 500, 'chunk_overlap': 100},
+    '.xml': {'chunk_size': 500, 'chunk_overlap': 100},
+    '.csv': {'chunk_size': 500, 'chunk_overlap': 50},
+}
+_DEFAULT_CHUNK_SETTINGS = {'chunk_size': 1000, 'chunk_overlap': 200}
+
+
+# Plain-text extensions chunked with the single-pass greedy splitter
+_FAST_SPLIT_EXTENSIONS = {'.txt', '.md', '.py'}
+
+
+def _fast_split(text: str, chunk_size: int, chunk_overlap: int) -> List[Tuple[int, int]]:
+    """
+    Splits text into overlapping chunks in a single forward walk.
+
+    Each chunk ends at the last paragraph break, line break or space inside
+    its window, falling back to a hard cut at chunk_size. The next chunk
+    starts at the first word boundary inside the overlap window, and
+    whitespace at chunk edges is trimmed.
+
+    Args:
+        text (str): The text to split.
+        chunk_size (int): Maximum number of characters per chunk.
+        chunk_overlap (int): Number of characters shared by consecutive chunks.
+
+    Returns:
+        List[Tuple[int, int]]: (start, end) offsets of each non-empty, trimmed chunk in text.
+    """
+    spans = []
+    start = 0
+    length = len(text)
+    while start < length:
+        end = min(start + chunk_size, length)
+        if end < length:
+            for separator in ("\n\n", "\n", " "):
+                cut = text.rfind(separator, start + 1, end)
+                if cut != -1:
+                    end = cut + len(separator)
+                    break
+
+        # Trim whitespace at the chunk edges
+        chunk_start, chunk_end = start, end
+        while chunk_start < chunk_end and text[chunk_start].isspace():
+            chunk_start += 1
+        while chunk_end > chunk_start and text[chunk_end - 1].isspace():
+            chunk_end -= 1
+        if chunk_start < chunk_end:
+            spans.append((chunk_start, chunk_end))
+
+        if end >= length:
+            break
+
+        # Start the next chunk on a word boundary inside the overlap window
+        window = max(end - chunk_overlap, start + 1)
+        if text[window - 1].isspace():
+            start = window
+        else:
+            boundaries = [i for i in (text.find(" ", window, end), text.find("\n", window, end)) if i != -1]
+            start = min(boundaries) + 1 if boundaries else end
+    return spans
+
+
+class GreedyTextSplitter:
+    def __init__(self, chunk_size: int, chunk_overlap: int):
+        """
+        Initializes a single-pass splitter for plain text files.
+
+        Args:
+            chunk_size (int): Maximum number of characters per chunk.
+            chunk_overlap (int): Number of characters shared by consecutive chunks.
+        """
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        """
+        Splits documents into chunks, recording each chunk's offsets in its metadata.
+
+        Args:
+            documents (List[Document]): The documents to split.
+
+        Returns:
+            List[Document]: The resulting chunks.
+        """
+        chunks = []
+        for doc in documents:
+            text = doc.page_content
+            for start, end in _fast_split(text, self.chunk_size, self.chunk_overlap):
+                chunks.append(Document(
+                    page_content=text[start:end],
+                    metadata={**doc.metadata, "start": start, "end": end},
+                ))
+        return chunks
+
+
+def _upcast_token_embeddings(module, inputs, features):
+    """
+    Forward hook that casts token embeddings back to fp32 so pooling and
+    normalization do not accumulate in bf16.
+    """
+    features["token_embeddings"] = features["token_embeddings"].float()
+    return features
+
+
+def _build_embeddings(
+    model_name: str,
+    device: str,
+    encode_kwargs: dict,
+    backend: str,
+    use_bf16: bool,
+):
+    """
+    Builds the embedding model for the given backend.
+
+    Args:
+        model_name (str): The HuggingFace model name for embeddings.
+        device (str): The device to run the model on ('cpu' or 'cuda').
+        encode_kwargs (dict): Additional keyword arguments for encoding.
+        backend (str): Embedding runtime, 'onnx' or 'torch'.
+        use_bf16 (bool): Cast the 'torch' model weights to bfloat16.
+
+    Returns:
+        Embeddings: The LangChain embeddings instance.
+
+    Raises:
+        ValueError: If the backend is not supported, or 'onnx' is used off the CPU.
+    """
+    if backend == "onnx":
+        if device != "cpu":
+            raise ValueError(f"The ONNX backend runs on CPU only, got device: {device}")
+        return OnnxBgeEmbeddings(
+            model_name=model_name,
+            onnx_dir=default_onnx_dir(model_name),
+            normalize_embeddings=encode_kwargs.get("normalize_embeddings", True),
+        )
+    if backend == "torch":
+        embeddings = HuggingFaceBgeEmbeddings(
+            model_name=model_name,
+            model_kwargs={"device": device},
+            encode_kwargs=encode_kwargs,
+        )
+        if use_bf16:
+            # Run the transformer in bf16 and upcast before pooling/normalize
+            model = embeddings.client
+            model.to(torch.bfloat16)
+            model[0].register_forward_hook(_upcast_token_embeddings)
+        return embeddings
+    raise ValueError(f"Unsupported embedding backend: {backend}")
+
 
 class EmbeddingsManager:
     def __init__(
@@ -14,6 +237,14 @@ class EmbeddingsManager:
         encode_kwargs: dict = {"normalize_embeddings": True},
         qdrant_url: str = "http://localhost:6333",
         collection_name: str = "vector_db",
+        vector_size: int = 384,
+        batch_size: int = 64,
+        use_bf16: bool = True,
+        backend: Optional[str] = None,
+        upsert_workers: int = 2,
+        max_pending_batches: int = 4,
+        indexing_threshold: int = 20000,
+        cache_path: Optional[str] = "emb_cache.sqlite",
     ):
         """
         Initializes the EmbeddingsManager with the specified model and Qdrant settings.
@@ -24,17 +255,98 @@ class EmbeddingsManager:
             encode_kwargs (dict): Additional keyword arguments for encoding.
             qdrant_url (str): The URL for the Qdrant instance.
             collection_name (str): The name of the Qdrant collection.
+            vector_size (int): Dimension of the embedding vectors (384 for bge-small-en).
+            batch_size (int): Number of chunks embedded and upserted per request.
+            use_bf16 (bool): Load the model weights in bfloat16 when the hardware supports it.
+                Only used by the 'torch' backend.
+            backend (Optional[str]): Embedding runtime, 'onnx' (ONNX Runtime, CPU only) or 'torch' (PyTorch).
+                Defaults to 'onnx' on CPU and 'torch' on other devices.
+            upsert_workers (int): Number of threads sending batches to Qdrant.
+            max_pending_batches (int): Maximum number of embedded batches waiting to be upserted.
+            indexing_threshold (int): Qdrant HNSW indexing threshold restored after an upload
+                when the collection does not report its own, or reports 0.
+            cache_path (Optional[str]): SQLite file caching embeddings by chunk content; None disables it.
         """
         self.model_name = model_name
         self.device = device
         self.encode_kwargs = encode_kwargs
         self.qdrant_url = qdrant_url
         self.collection_name = collection_name
+        self.vector_size = vector_size
+        self.batch_size = batch_size
+        self.use_bf16 = use_bf16 and _bf16_supported(self.device)
+        self.backend = backend or ("onnx" if self.device == "cpu" else "torch")
+        self.upsert_workers = upsert_workers
+        self.max_pending_batches = max_pending_batches
+        self.indexing_threshold = indexing_threshold
+        self.cache_path = cache_path
+        self._splitter_cache: Dict[tuple, Union[RecursiveCharacterTextSplitter, GreedyTextSplitter]] = {}
+        # Serializes uploads when one manager is shared across Streamlit sessions
+        self._ingest_lock = threading.Lock()
 
-        self.embeddings = HuggingFaceBgeEmbeddings(
-            model_name=self.model_name,
-            model_kwargs={"device": self.device},
-            encode_kwargs=self.encode_kwargs,
+        self.embeddings = _build_embeddings(**self._embeddings_config())
+
+        # Initialize the embedding cache so re-uploaded chunks are not re-embedded
+        self._cache = None
+        # Namespace entries by the full embedding config (model, backend, device,
+        # normalization, bf16) so vectors from different setups are never mixed
+        self._cache_namespace = _content_hash(
+            json.dumps(self._embeddings_config(), sort_keys=True, default=str)
+        )
+        self._cache_lock = threading.Lock()
+        if self.cache_path:
+            self._cache = sqlite3.connect(self.cache_path, check_same_thread=False)
+            self._cache.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(model TEXT, hash TEXT, vector BLOB, PRIMARY KEY (model, hash))"
+            )
+            self._cache.commit()
+
+        # Initialize Qdrant client once and reuse it for every upload
+        self.client = QdrantClient(url=self.qdrant_url, prefer_grpc=True, timeout=60)
+
+    def _embeddings_config(self) -> dict:
+        """
+        Returns the keyword arguments used to build the embedding model.
+
+        Returns:
+            dict: Keyword arguments for _build_embeddings.
+        """
+        return {
+            "model_name": self.model_name,
+            "device": self.device,
+            "encode_kwargs": self.encode_kwargs,
+            "backend": self.backend,
+            "use_bf16": self.use_bf16,
+        }
+
+    def _ensure_collection(self):
+        """
+        Creates the Qdrant collection if it does not exist yet.
+
+        Called at the start of each upload rather than in __init__, so an
+        unreachable Qdrant surfaces as a ConnectionError from create_embeddings.
+        Existing collections are left untouched so previously uploaded
+        documents stay searchable. New collections keep the original fp32
+        vectors on disk and an INT8 scalar-quantized copy in RAM for search.
+        """
+        existing = {c.name for c in self.client.get_collections().collections}
+        if self.collection_name in existing:
+            return
+        self.client.create_collection(
+            collection_name=self.collection_name,
+            vectors_config=VectorParams(
+                size=self.vector_size,
+                distance=Distance.COSINE,
+                on_disk=True,
+            ),
+            quantization_config=ScalarQuantization(
+                scalar=ScalarQuantizationConfig(
+                    type=ScalarType.INT8,
+                    quantile=0.99,
+                    always_ram=True,
+                ),
+            ),
         )
 
     def _get_loader(self, file_path: str):
@@ -64,50 +376,152 @@ class EmbeddingsManager:
             Dict[str, int]: Dictionary containing chunk size and overlap settings
         """
         file_extension = os.path.splitext(file_path)[1].lower()
-        
-        settings = {
-            # Text files and documentation
-            '.txt': {'chunk_size': 1000, 'chunk_overlap': 200},
-            '.md': {'chunk_size': 1000, 'chunk_overlap': 200},
-            '.pdf': {'chunk_size': 1000, 'chunk_overlap': 200},
-            '.doc': {'chunk_size': 1000, 'chunk_overlap': 200},
-            '.docx': {'chunk_size': 1000, 'chunk_overlap': 200},
-            
-            # Code files
-            '.py': {'chunk_size': 800, 'chunk_overlap': 150},
-            '.js': {'chunk_size': 800, 'chunk_overlap': 150},
-            '.jsx': {'chunk_size': 800, 'chunk_overlap': 150},
-            '.ts': {'chunk_size': 800, 'chunk_overlap': 150},
-            '.tsx': {'chunk_size': 800, 'chunk_overlap': 150},
-            '.css': {'chunk_size': 600, 'chunk_overlap': 100},
-            '.scss': {'chunk_size': 600, 'chunk_overlap': 100},
-            '.html': {'chunk_size': 800, 'chunk_overlap': 150},
-            
-            # Data files
-            '.json': {'chunk_size': 500, 'chunk_overlap': 100},
-            '.xml': {'chunk_size': 500, 'chunk_overlap': 100},
-            '.csv': {'chunk_size': 500, 'chunk_overlap': 50},
-            
-            # Default settings
-            'default': {'chunk_size': 1000, 'chunk_overlap': 200}
-        }
-        
-        return settings.get(file_extension, settings['default'])
+        return _CHUNK_SETTINGS.get(file_extension, _DEFAULT_CHUNK_SETTINGS)
+
+    def _get_text_splitter(
+        self, file_path: str
+    ) -> Union[RecursiveCharacterTextSplitter, GreedyTextSplitter]:
+        """
+        Returns a text splitter for the file type, reusing one instance per chunk settings.
 
-    def create_embeddings(self, file_path: str):
+        Plain text files use the single-pass GreedyTextSplitter; everything
+        else uses RecursiveCharacterTextSplitter.
+
+        Args:
+            file_path (str): Path to the file.
+
+        Returns:
+            Union[RecursiveCharacterTextSplitter, GreedyTextSplitter]: Text splitter instance
+        """
+        file_extension = os.path.splitext(file_path)[1].lower()
+        fast = file_extension in _FAST_SPLIT_EXTENSIONS
+        chunk_settings = self._get_chunk_settings(file_path)
+        key = (fast, chunk_settings['chunk_size'], chunk_settings['chunk_overlap'])
+        if key not in self._splitter_cache:
+            if fast:
+                self._splitter_cache[key] = GreedyTextSplitter(
+                    chunk_size=chunk_settings['chunk_size'],
+                    chunk_overlap=chunk_settings['chunk_overlap'],
+                )
+            else:
+                self._splitter_cache[key] = RecursiveCharacterTextSplitter(
+                    chunk_size=chunk_settings['chunk_size'],
+                    chunk_overlap=chunk_settings['chunk_overlap'],
+                    separators=["\n\n", "\n", " ", ""]
+                )
+        return self._splitter_cache[key]
+
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds texts, reusing cached vectors for chunks seen before.
+
+        Only cache misses are sent to the embedding model; their vectors are
+        written back to the cache.
+
+        Args:
+            texts (List[str]): The chunk texts to embed.
+
+        Returns:
+            List[List[float]]: One embedding per text, in input order.
+        """
+        if self._cache is None:
+            return self.embeddings.embed_documents(texts)
+
+        hashes = [_content_hash(text) for text in texts]
+        placeholders = ",".join("?" * len(hashes))
+        with self._cache_lock:
+            rows = self._cache.execute(
+                f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                [self._cache_namespace, *hashes],
+            ).fetchall()
+        cached = {h: np.frombuffer(blob, dtype=np.float32).tolist() for h, blob in rows}
+
+        vectors = [cached.get(h) for h in hashes]
+        misses = [i for i, vector in enumerate(vectors) if vector is None]
+        if misses:
+            new_vectors = self.embeddings.embed_documents([texts[i] for i in misses])
+            for i, vector in zip(misses, new_vectors):
+                vectors[i] = vector
+            with self._cache_lock:
+                self._cache.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)",
+                    [
+                        (self._cache_namespace, hashes[i], np.asarray(vectors[i], dtype=np.float32).tobytes())
+                        for i in misses
+                    ],
+                )
+                self._cache.commit()
+        return vectors
+
+    def _get_indexing_threshold(self) -> int:
+        """
+        Returns the collection's current HNSW indexing threshold.
+
+        A threshold of 0 is treated as unset: it is what an interrupted upload
+        leaves behind, and restoring it would keep indexing off for good.
+
+        Returns:
+            int: The configured threshold, or the manager's default if unset or 0.
+        """
+        info = self.client.get_collection(collection_name=self.collection_name)
+        threshold = info.config.optimizer_config.indexing_threshold
+        return threshold or self.indexing_threshold
+
+    def _set_indexing_threshold(self, threshold: int):
+        """
+        Updates the HNSW indexing threshold of the collection.
+
+        Args:
+            threshold (int): The new threshold; 0 disables indexing.
+        """
+        self.client.update_collection(
+            collection_name=self.collection_name,
+            optimizer_config=OptimizersConfigDiff(indexing_threshold=threshold),
+        )
+
+    def _upsert_batch(self, batch: List[Document], vectors: List[List[float]]):
         """
-        Processes the document, creates embeddings, and stores them in Qdrant.
+        Upserts one batch of chunks and their vectors into Qdrant.
+
+        The payload layout matches LangChain's Qdrant vector store so the
+        chatbot can read the points back as documents. Metadata is reduced to
+        plain JSON types first, since the gRPC payload conversion rejects
+        tuples (e.g. PDF element coordinates) and other non-JSON values.
+
+        Args:
+            batch (List[Document]): The chunks in this batch.
+            vectors (List[List[float]]): The embedding for each chunk.
+        """
+        points = [
+            PointStruct(
+                id=uuid.uuid4().hex,
+                vector=vector,
+                payload={
+                    "page_content": split.page_content,
+                    "metadata": json.loads(json.dumps(split.metadata, default=str)),
+                },
+            )
+            for split, vector in zip(batch, vectors)
+        ]
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=points,
+            wait=False,
+        )
+
+    def _load_and_split(self, file_path: str) -> List[Document]:
+        """
+        Loads a document and splits it into chunks.
 
         Args:
             file_path (str): The file path to the document.
 
         Returns:
-            str: Success message upon completion.
+            List[Document]: The text chunks.
 
         Raises:
             FileNotFoundError: If the file does not exist.
             ValueError: If no documents are loaded or no chunks are created.
-            ConnectionError: If connection to Qdrant fails.
         """
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"The file {file_path} does not exist.")
@@ -121,13 +535,8 @@ class EmbeddingsManager:
         except Exception as e:
             raise ValueError(f"Error loading document: {str(e)}")
 
-        # Get chunk settings and create text splitter
-        chunk_settings = self._get_chunk_settings(file_path)
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_settings['chunk_size'],
-            chunk_overlap=chunk_settings['chunk_overlap'],
-            separators=["\n\n", "\n", " ", ""]
-        )
+        # Get the text splitter for this file type
+        text_splitter = self._get_text_splitter(file_path)
 
         # Split documents
         try:
@@ -137,16 +546,76 @@ class EmbeddingsManager:
         except Exception as e:
             raise ValueError(f"Error splitting document: {str(e)}")
 
-        # Create and store embeddings in Qdrant
-        try:
-            qdrant = Qdrant.from_documents(
-                splits,
-                self.embeddings,
-                url=self.qdrant_url,
-                prefer_grpc=False,
-                collection_name=self.collection_name,
-            )
-        except Exception as e:
-            raise ConnectionError(f"Failed to connect to Qdrant: {str(e)}")
+        return splits
+
+    def create_embeddings(self, file_paths: Union[str, List[str]]):
+        """
+        Processes one or more documents, creates embeddings, and stores them in Qdrant.
+
+        Args:
+            file_paths (Union[str, List[str]]): The file path, or list of file paths, to the documents.
+
+        Returns:
+            str: Success message upon completion.
+
+        Raises:
+            FileNotFoundError: If a file does not exist.
+            ValueError: If no documents are loaded or no chunks are created.
+            ConnectionError: If connection to Qdrant fails.
+        """
+        if isinstance(file_paths, str):
+            file_paths = [file_paths]
+
+        splits = []
+        for file_path in file_paths:
+            splits.extend(self._load_and_split(file_path))
+
+        # One upload at a time: the indexing threshold is collection-wide and the
+        # embedding tokenizer is not safe for concurrent calls
+        with self._ingest_lock:
+            # Group identical chunks so each distinct text is embedded only once
+            groups: Dict[str, List[Document]] = {}
+            for split in splits:
+                groups.setdefault(split.page_content, []).append(split)
+
+            # Sort longest first so each batch holds texts of similar length and
+            # the embedder pads little when it pads to the longest in the batch
+            texts = sorted(groups, key=len, reverse=True)
+            batches = [
+                texts[start:start + self.batch_size]
+                for start in range(0, len(texts), self.batch_size)
+            ]
+
+            # Create and store embeddings in Qdrant, upserting batch N while batch N+1 is embedded.
+            # Indexing is deferred until all batches are in.
+            try:
+                self._ensure_collection()
+                indexing_threshold = self._get_indexing_threshold()
+                self._set_indexing_threshold(0)
+                try:
+                    with ThreadPoolExecutor(max_workers=self.upsert_workers) as executor:
+                        pending = deque()
+                        for batch in batches:
+                            vectors = self._embed_texts(batch)
+                            # Fan each vector out to every chunk sharing its text
+                            batch_splits = [split for text in batch for split in groups[text]]
+                            batch_vectors = [
+                                vector for text, vector in zip(batch, vectors) for _ in groups[text]
+                            ]
+                            # Duplicates can multiply a batch; keep each request to batch_size points
+                            for start in range(0, len(batch_splits), self.batch_size):
+                                pending.append(executor.submit(
+                                    self._upsert_batch,
+                                    batch_splits[start:start + self.batch_size],
+                                    batch_vectors[start:start + self.batch_size],
+                                ))
+                                if len(pending) >= self.max_pending_batches:
+                                    pending.popleft().result()
+                        for future in pending:
+                            future.result()
+                finally:
+                    self._set_indexing_threshold(indexing_threshold)
+            except Exception as e:
+                raise ConnectionError(f"Failed to connect to Qdrant: {str(e)}")
 
         return "✅ Vector DB Successfully Created and Stored in Qdrant!"